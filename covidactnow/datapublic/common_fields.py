@@ -161,7 +161,9 @@ COMMON_LEGACY_REGION_FIELDS = [
 ]
 
 
-COMMON_FIELDS_ORDER_MAP = {common: i for i, common in enumerate(CommonFields)}
+# Keyed by the plain str value so lookups hash a str instead of an enum member. CommonFields are a
+# str subclass so looking up a CommonFields member works too.
+COMMON_FIELDS_ORDER_MAP = {common.value: i for i, common in enumerate(CommonFields)}
 
 
 class FieldNameAndCommonField(FieldName):
@@ -1,13 +1,18 @@
 """Helpers to access and query data surfaced from the scraped Covid County Data.
 """
 import pathlib
+from typing import Dict
 from typing import List
 import enum
 import dataclasses
 from typing import Optional
+from typing import Sequence
 
 import more_itertools
-import requests
+import numpy as np
+import pyarrow
+import pyarrow.dataset
+import pyarrow.parquet
 import structlog
 import pandas as pd
 from covidactnow.datapublic.common_fields import FieldNameAndCommonField
@@ -67,29 +72,186 @@ class ScraperVariable:
     sex: str = "all"
 
 
+# Names of the columns as plain str. Each Fields value is a FieldNameAndCommonField, a str subclass
+# that pyarrow.dataset.field rejects, so these are converted once and used when building pyarrow
+# filters and column lists.
+_ALL_COLUMNS = [str(f.value) for f in Fields]
+_PROVIDER_COLUMN = str(Fields.PROVIDER.value)
+_DATE_COLUMN = str(Fields.DATE.value)
+_VARIABLE_NAME_COLUMN = str(Fields.VARIABLE_NAME.value)
+_MEASUREMENT_COLUMN = str(Fields.MEASUREMENT.value)
+_UNIT_COLUMN = str(Fields.UNIT.value)
+_AGE_COLUMN = str(Fields.AGE.value)
+_RACE_COLUMN = str(Fields.RACE.value)
+_SEX_COLUMN = str(Fields.SEX.value)
+
+# Columns of the CCD DataFrame that identify a ScraperVariable. These have the same names as the
+# ScraperVariable attributes.
+_VARIABLE_KEY_COLUMNS = [
+    _PROVIDER_COLUMN,
+    _VARIABLE_NAME_COLUMN,
+    _MEASUREMENT_COLUMN,
+    _UNIT_COLUMN,
+    _AGE_COLUMN,
+    _RACE_COLUMN,
+    _SEX_COLUMN,
+]
+# Index of the DataFrame used to find the rows of a single variable. MEASUREMENT and UNIT are last
+# because they may be unspecified in a ScraperVariable and are not part of the lookup key.
+_ROWS_INDEX_COLUMNS = [
+    _PROVIDER_COLUMN,
+    _VARIABLE_NAME_COLUMN,
+    _AGE_COLUMN,
+    _RACE_COLUMN,
+    _SEX_COLUMN,
+    _MEASUREMENT_COLUMN,
+    _UNIT_COLUMN,
+]
+# Columns with the demographic breakdown of a value. These are not loaded when only the rows with
+# value "all" are needed.
+_DEMOGRAPHIC_COLUMNS = [_AGE_COLUMN, _RACE_COLUMN, _SEX_COLUMN]
+_COMMON_FIELD = "common_field"
+_SCRAPER_VARIABLE = "scraper_variable"
+
+
+def _is_all_demographics(variable: ScraperVariable) -> bool:
+    return variable.age == "all" and variable.race == "all" and variable.sex == "all"
+
+
+def _equals(series: pd.Series, value: str) -> np.ndarray:
+    """Returns `series == value` as a numpy array, comparing the codes of a Categorical directly.
+
+    This looks up the code of `value` once and does a single comparison of the small integer codes.
+    """
+    if pd.api.types.is_categorical_dtype(series.dtype):
+        categories = series.cat.categories
+        if value not in categories:
+            return np.zeros(len(series), dtype=bool)
+        return series.cat.codes.to_numpy() == categories.get_loc(value)
+    return series.to_numpy() == value
+
+
+def _value_counts_dict(series: pd.Series) -> Dict[str, int]:
+    """Returns counts of values in `series`, skipping unused categories of a Categorical."""
+    counts = series.value_counts()
+    return counts.loc[counts > 0].to_dict()
+
+
+# Number of rows in each row group of the clustered parquet file. Smaller row groups let a filter
+# skip more rows at the cost of more metadata.
+_CLUSTERED_ROW_GROUP_SIZE = 128 * 1024
+
+
+def _cluster_parquet_file(path: pathlib.Path, dest_path: pathlib.Path):
+    """Writes the parquet file at `path` to `dest_path` sorted by provider, variable_name and date.
+
+    Row group statistics are only useful when similar rows are stored together. After sorting, a
+    filter on provider and variable_name reads a few contiguous row groups and skips the rest.
+    """
+    table = pyarrow.parquet.read_table(path)
+    # Only the sort key columns are converted to pandas. The rows are reordered in arrow so the
+    # whole table is never converted.
+    sort_keys = []
+    for column in [_DATE_COLUMN, _VARIABLE_NAME_COLUMN, _PROVIDER_COLUMN]:
+        values = table.column(column).to_pandas()
+        sort_keys.append(pd.factorize(values, sort=True)[0])
+    # lexsort is stable and sorts by the last key first.
+    order = np.lexsort(sort_keys)
+    sorted_table = table.take(pyarrow.array(order))
+    del table
+    # Write to a temporary file first so that a failure doesn't leave a partial file that looks
+    # up to date.
+    tmp_path = dest_path.with_name(dest_path.name + ".tmp")
+    pyarrow.parquet.write_table(
+        sorted_table,
+        tmp_path,
+        row_group_size=_CLUSTERED_ROW_GROUP_SIZE,
+        use_dictionary=True,
+        compression="zstd",
+    )
+    tmp_path.replace(dest_path)
+
+
+def _clustered_copy_path() -> pathlib.Path:
+    return DATA_PATH.with_name(DATA_PATH.stem + ".clustered.parquet")
+
+
+def clustered_data_path() -> pathlib.Path:
+    """Returns the path of the CCD parquet file to read.
+
+    This is a copy of DATA_PATH clustered by `_cluster_parquet_file` when `fetch_data` has written
+    one that is up to date. Otherwise it is DATA_PATH so that a checkout without the copy, which is
+    not committed, reads the mirror once instead of also sorting and writing it.
+    """
+    path = _clustered_copy_path()
+    if path.exists() and path.stat().st_mtime >= DATA_PATH.stat().st_mtime:
+        return path
+    return DATA_PATH
+
+
+def fetch_data():
+    """Downloads the latest parquet file to DATA_PATH, if it changed.
+
+    DATA_PATH stays an unmodified mirror of DATA_URL. After a download a clustered copy of it is
+    written for `clustered_data_path`.
+    """
+    if helpers.download_if_changed(DATA_URL, DATA_PATH):
+        _cluster_parquet_file(DATA_PATH, _clustered_copy_path())
+
+
 @dataclasses.dataclass
 class CovidCountyDataset:
 
     timeseries_df: pd.DataFrame
 
+    # Set by `load` when timeseries_df has only some of the rows of the parquet file at this path.
+    # `check_variable_coverage` then counts the variables of a provider in the file.
+    upstream_path: Optional[pathlib.Path] = None
+
+    # timeseries_df with a sorted index on the key columns, built by `_get_indexed_df`.
+    _indexed_df: Optional[pd.DataFrame] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @property
+    def has_demographic_breakdown(self) -> bool:
+        """False when only rows for age, race and sex "all" were loaded and those columns dropped."""
+        return Fields.AGE.value in self.timeseries_df.columns
+
+    def _key_columns(self, columns: List[str], variables: List[ScraperVariable]) -> List[str]:
+        """Returns `columns` without demographic columns when they are not in timeseries_df."""
+        if self.has_demographic_breakdown:
+            return columns
+        assert all(_is_all_demographics(v) for v in variables), "demographic columns not loaded"
+        return [c for c in columns if c not in _DEMOGRAPHIC_COLUMNS]
+
+    def _get_indexed_df(self) -> pd.DataFrame:
+        """Returns timeseries_df indexed by _ROWS_INDEX_COLUMNS, sorting it the first time."""
+        if self._indexed_df is None:
+            index_columns = self._key_columns(_ROWS_INDEX_COLUMNS, [])
+            self._indexed_df = self.timeseries_df.set_index(index_columns, drop=False).sort_index()
+        return self._indexed_df
+
     def _get_rows(self, variable: ScraperVariable) -> pd.DataFrame:
-        all_df = self.timeseries_df
-
-        is_selected_data = (
-            (all_df[Fields.PROVIDER] == variable.provider)
-            & (all_df[Fields.VARIABLE_NAME] == variable.variable_name)
-            & (all_df[Fields.AGE] == variable.age)
-            & (all_df[Fields.RACE] == variable.race)
-            & (all_df[Fields.SEX] == variable.sex)
-        )
+        # Binary search of the sorted index finds the rows of a variable without scanning all rows.
+        key_columns = self._key_columns(_ROWS_INDEX_COLUMNS, [variable])
+        key = tuple(dataclasses.asdict(variable)[c] for c in key_columns[:-2])
+        indexed_df = self._get_indexed_df()
+        # The levels of key columns loaded as Categoricals raise a TypeError instead of a KeyError
+        # when looking up a value that isn't a category, so check for missing values first.
+        if any(part not in level for part, level in zip(key, indexed_df.index.levels)):
+            return self.timeseries_df.iloc[0:0]
+        try:
+            rows = indexed_df.loc[key, :]
+        except KeyError:
+            return self.timeseries_df.iloc[0:0]
+
+        # An empty measurement or unit matches all values.
         if variable.measurement:
-            is_selected_data = is_selected_data & (
-                all_df[Fields.MEASUREMENT] == variable.measurement
-            )
+            rows = rows.loc[_equals(rows[Fields.MEASUREMENT], variable.measurement), :]
         if variable.unit:
-            is_selected_data = is_selected_data & (all_df[Fields.UNIT] == variable.unit)
-
-        return all_df.loc[is_selected_data, :].copy()
+            rows = rows.loc[_equals(rows[Fields.UNIT], variable.unit), :]
+        return rows.reset_index(drop=True)
 
     def query_multiple_variables(
         self, variables: List[ScraperVariable], *, log_provider_coverage_warnings: bool = False
@@ -103,43 +265,63 @@ class CovidCountyDataset:
         """
         if log_provider_coverage_warnings:
             self.check_variable_coverage(variables)
-        selected_data = []
+        selected_variables = []
 
-        for variable in variables:
+        # A variable listed more than once would add a copy of each of its rows to the merge.
+        for variable in dict.fromkeys(variables):
             # Check that `variable` agrees with stuff in the ScraperVariable docstring.
             if variable.common_field is None:
                 assert variable.measurement == ""
                 assert variable.unit == ""
-                continue
             else:
                 # Must be set when copying to the return value
                 assert variable.measurement
                 assert variable.unit
-
-            data = self._get_rows(variable)
-            if data.empty and log_provider_coverage_warnings:
+                selected_variables.append(variable)
+
+        # Select the rows of every variable with a single merge on the key columns instead of
+        # scanning all of timeseries_df once per variable.
+        variables_df = pd.DataFrame([dataclasses.asdict(v) for v in selected_variables])
+        variables_df[_SCRAPER_VARIABLE] = selected_variables
+        combined_df = self.timeseries_df.merge(
+            variables_df,
+            how="right",
+            on=self._key_columns(_VARIABLE_KEY_COLUMNS, selected_variables),
+            indicator=True,
+        )
+        is_missing = combined_df["_merge"] == "right_only"
+        if log_provider_coverage_warnings:
+            for variable in combined_df.loc[is_missing, _SCRAPER_VARIABLE]:
                 _logger.info("No data rows found for variable", variable=variable)
                 more_data = self._get_rows(dataclasses.replace(variable, measurement="", unit=""))
                 _logger.info(
                     "Try these parameters",
                     variable_name=variable.variable_name,
-                    measurement_counts=str(more_data[Fields.MEASUREMENT].value_counts().to_dict()),
-                    unit_counts=str(more_data[Fields.UNIT].value_counts().to_dict()),
+                    measurement_counts=str(_value_counts_dict(more_data[Fields.MEASUREMENT])),
+                    unit_counts=str(_value_counts_dict(more_data[Fields.UNIT])),
                 )
 
-            # Rename fields if common field name exists
-            if variable.common_field:
-                data.loc[:, Fields.VARIABLE_NAME] = variable.common_field
-
-            selected_data.append(data)
-
-        combined_df = pd.concat(selected_data)
-
-        wide_df = combined_df.pivot_table(
-            index=[Fields.LOCATION.value, Fields.DATE.value, Fields.LOCATION_TYPE.value],
-            columns=Fields.VARIABLE_NAME.value,
-            values=Fields.VALUE.value,
-        ).reset_index()
+        # There is expected to be at most one value per (location, date, variable) so reshape with
+        # unstack instead of the aggregation done by pivot_table. Rows without a value, including
+        # the rows added by the merge for variables without data, are dropped as pivot_table does.
+        # Unstacking the common_field column names the output columns without copying
+        # combined_df to rename VARIABLE_NAME.
+        wide_index = [
+            Fields.LOCATION.value,
+            Fields.DATE.value,
+            Fields.LOCATION_TYPE.value,
+            _COMMON_FIELD,
+        ]
+        # Only the columns used to build wide_df are kept so the copies made by dropna and
+        # drop_duplicates don't include the other key columns.
+        long_df = combined_df.loc[:, wide_index + [Fields.VALUE.value]]
+        wide_df = (
+            long_df.dropna(subset=[Fields.VALUE.value])
+            .drop_duplicates(subset=wide_index, keep="last")
+            .set_index(wide_index)[Fields.VALUE.value]
+            .unstack(_COMMON_FIELD)
+            .reset_index()
+        )
 
         data = wide_df.rename(
             columns={
@@ -153,10 +335,24 @@ class CovidCountyDataset:
 
     def check_variable_coverage(self, variables: List[ScraperVariable]):
         provider_name = more_itertools.one(set(v.provider for v in variables))
-        provider_mask = self.timeseries_df[Fields.PROVIDER] == provider_name
-        counts = self.timeseries_df.loc[provider_mask, Fields.VARIABLE_NAME].value_counts()
+        if self.upstream_path is None:
+            provider_mask = _equals(self.timeseries_df[Fields.PROVIDER], provider_name)
+            variable_names = self.timeseries_df.loc[provider_mask, Fields.VARIABLE_NAME]
+        else:
+            # Only the variable_name column of the provider's rows is read.
+            variable_names = (
+                pyarrow.dataset.dataset(self.upstream_path, format="parquet")
+                .to_table(
+                    columns=[_VARIABLE_NAME_COLUMN],
+                    filter=pyarrow.dataset.field(_PROVIDER_COLUMN) == provider_name,
+                )
+                .column(0)
+                .dictionary_encode()
+                .to_pandas()
+            )
+        counts = _value_counts_dict(variable_names)
         variables_by_name = {var.variable_name: var for var in variables}
-        for variable_name, count in counts.iteritems():
+        for variable_name, count in counts.items():
             if variable_name not in variables_by_name:
                 _logger.info(
                     "Upstream has variable not in variables list",
@@ -165,14 +361,55 @@ class CovidCountyDataset:
                 )
 
     @staticmethod
-    def load(*, fetch: bool) -> "CovidCountyDataset":
-        """Loads CovidCountyData, performing minor cleanup."""
+    def load(
+        *, fetch: bool, variables: Optional[Sequence[ScraperVariable]] = None
+    ) -> "CovidCountyDataset":
+        """Loads CovidCountyData, performing minor cleanup.
 
-        if fetch:
-            response = requests.get(DATA_URL)
-            DATA_PATH.write_bytes(response.content)
+        Args:
+            fetch: Download the latest parquet file before loading it.
+            variables: If set, only rows with a provider and variable_name found in `variables`
+              are read from the parquet file. Row groups without matching rows are skipped so this
+              is much faster than loading everything. `check_variable_coverage` still counts
+              all variables of the provider in the parquet file. If none of `variables` has a
+              demographic breakdown only rows with age, race and sex "all" are read and those
+              columns are dropped.
+        """
 
-        all_df = pd.read_parquet(DATA_PATH)
+        if fetch:
+            fetch_data()
+
+        # pyarrow.dataset uses the row group statistics to skip row groups that can't match the
+        # filter and only reads the requested columns.
+        filter_expression = None
+        columns = _ALL_COLUMNS
+        if variables is not None:
+            providers = sorted({v.provider for v in variables})
+            variable_names = sorted({v.variable_name for v in variables})
+            filter_expression = pyarrow.dataset.field(_PROVIDER_COLUMN).isin(providers)
+            filter_expression &= pyarrow.dataset.field(_VARIABLE_NAME_COLUMN).isin(variable_names)
+            if all(_is_all_demographics(v) for v in variables):
+                for column in _DEMOGRAPHIC_COLUMNS:
+                    filter_expression &= pyarrow.dataset.field(column) == "all"
+                columns = [c for c in columns if c not in _DEMOGRAPHIC_COLUMNS]
+        data_path = clustered_data_path()
+        table = pyarrow.dataset.dataset(data_path, format="parquet").to_table(
+            columns=columns, filter=filter_expression
+        )
+        # The key columns have few distinct values. Comparing the integer codes of a Categorical is
+        # much faster than comparing millions of str objects and uses much less memory. Dictionary
+        # encoding them in arrow makes to_pandas create Categoricals without building str objects.
+        # Keep LOCATION as is to avoid groupby and pivot creating a row for every possible FIPS.
+        for column in _VARIABLE_KEY_COLUMNS:
+            if column in table.column_names:
+                i = table.schema.get_field_index(column)
+                table = table.set_column(i, column, table.column(i).dictionary_encode())
+        # self_destruct frees each arrow column once it has been converted. `table` must not be
+        # used after this.
+        all_df = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
         all_df[Fields.LOCATION] = helpers.fips_from_int(all_df[Fields.LOCATION])
 
-        return CovidCountyDataset(all_df)
+        return CovidCountyDataset(
+            all_df, upstream_path=data_path if variables is not None else None
+        )
@@ -1,18 +1,55 @@
 import datetime
+import functools
+import http
 import pathlib
 import re
+import shutil
+from typing import FrozenSet
+from typing import Mapping
 from typing import MutableMapping
 from typing import Set
 from typing import Type
 
+import numpy as np
 import pandas as pd
 import pytz
+import requests
+import requests.adapters
+import urllib3.util
 
 from covidactnow.datapublic import common_fields
 
 MISSING_COLUMNS_MESSAGE = "DataFrame is missing expected column(s)"
 EXTRA_COLUMNS_MESSAGE = "DataFrame has extra unexpected column(s)"
 
+# Maximum number of connections to each host kept open by HTTP_SESSION.
+_HTTP_POOL_MAXSIZE = 32
+
+# Size of the chunks that download_if_changed copies from the response to the file.
+_DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+
+def _create_http_session() -> requests.Session:
+    """Returns a Session that reuses connections across threads and retries transient errors."""
+    session = requests.Session()
+    retry = urllib3.util.Retry(
+        total=5, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]
+    )
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=_HTTP_POOL_MAXSIZE, pool_maxsize=_HTTP_POOL_MAXSIZE, max_retries=retry
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Shared by the scripts so that requests to the same host reuse a connection instead of doing a
+# new TLS handshake each time.
+HTTP_SESSION = _create_http_session()
+
+# Matches the position before each capital letter, except at the start, of a CamelCase name.
+_CAMEL_SPLIT_RE = re.compile(r"(?<!^)(?=[A-Z])")
+
 
 def load_county_fips_data(fips_csv: pathlib.Path) -> pd.DataFrame:
     df = pd.read_csv(fips_csv, dtype={"fips": str})
@@ -20,6 +57,21 @@ def load_county_fips_data(fips_csv: pathlib.Path) -> pd.DataFrame:
     return df
 
 
+@functools.lru_cache(maxsize=None)
+def _field_values(fields: Type[common_fields.FieldNameAndCommonField]) -> FrozenSet[str]:
+    """Returns the values of the members of enum `fields`, computed once per enum class."""
+    return frozenset(f.value for f in fields)
+
+
+@functools.lru_cache(maxsize=None)
+def _common_field_renames(fields: Type[common_fields.FieldNameAndCommonField]) -> Mapping[str, str]:
+    """Returns a map from field value to common field name, computed once per enum class.
+
+    Do not modify the result.
+    """
+    return {f.value: f.common_field.value for f in fields if f.common_field}
+
+
 def rename_fields(
     df: pd.DataFrame,
     fields: Type[common_fields.FieldNameAndCommonField],
@@ -33,31 +85,37 @@ def rename_fields(
     Unexpected columns are logged. Extra fields are optionally logged and source to add the fields
     to the enum is printed.
     """
+    columns = set(df.columns)
+    field_values = _field_values(fields)
     if check_extra_fields:
-        extra_fields = set(df.columns) - set(fields) - already_transformed_fields
+        extra_fields = columns - field_values - already_transformed_fields
         if extra_fields:
             # If this warning happens in a test check that the sample data in tests/data
             # has the same fields as the argument passed to `fields`.
             log.warning(EXTRA_COLUMNS_MESSAGE, extra_fields=extra_fields)
             print("-- Add the following lines to the appropriate Fields enum --")
             for extra_field in extra_fields:
-                enum_name = re.sub(r"(?<!^)(?=[A-Z])", "_", extra_field).upper()
+                enum_name = _CAMEL_SPLIT_RE.sub("_", extra_field).upper()
                 print(f'    {enum_name} = "{extra_field}", None')
             print("-- end of suggested new Fields --")
-    missing_fields = set(fields) - set(df.columns)
+    missing_fields = field_values - columns
     if missing_fields:
         # If this warning happens in a test check that the sample data in tests/data
         # has the same fields as the argument passed to `fields`.
         log.warning(MISSING_COLUMNS_MESSAGE, missing_fields=missing_fields)
+    common_field_rename = {
+        value: common_field
+        for value, common_field in _common_field_renames(fields).items()
+        if value in columns
+    }
+    misconfigured = already_transformed_fields & common_field_rename.keys()
+    if misconfigured:
+        raise AssertionError(f"Fields {misconfigured} misconfigured")
     rename: MutableMapping[str, str] = {f: f for f in already_transformed_fields}
-    for col in df.columns:
-        field = fields.get(col)
-        if field and field.common_field:
-            if field.value in rename:
-                raise AssertionError(f"Field {repr(field)} misconfigured")
-            rename[field.value] = field.common_field.value
-    # Copy only columns in `rename.keys()` to a new DataFrame and rename.
-    df = df.loc[:, list(rename.keys())].rename(columns=rename)
+    rename.update(common_field_rename)
+    # Copy only columns in `rename.keys()` to a new DataFrame and rename. The copy made by `loc`
+    # is already a new DataFrame so `rename` doesn't need to copy it again.
+    df = df.loc[:, list(rename.keys())].rename(columns=rename, copy=False)
     return df
 
 
@@ -87,4 +145,75 @@ def fips_from_int(param: pd.Series):
 
     See https://github.com/valorumdata/covid_county_data.py/issues/3
     """
-    return param.apply(lambda v: f"{v:0>{2 if v < 100 else 5}}")
+    # There are a few thousand distinct locations repeated across many rows. Format each of them
+    # once and expand back to all rows. Missing locations stay missing. A column with missing
+    # values is read as float so the values are converted to int before formatting.
+    values = param.to_numpy()
+    is_present = pd.notna(values)
+    uniques, inverse = np.unique(values[is_present].astype(np.int64), return_inverse=True)
+    uniques_str = uniques.astype(str)
+    uniques_fips = np.where(
+        uniques < 100, np.char.zfill(uniques_str, 2), np.char.zfill(uniques_str, 5)
+    ).astype(object)
+    fips = np.full(len(values), np.nan, dtype=object)
+    fips[is_present] = uniques_fips[inverse]
+    return pd.Series(fips, index=param.index, name=param.name)
+
+
+# Columns that repeat a few distinct location values in every row of a timeseries.
+_LOCATION_COLUMNS = [
+    common_fields.CommonFields.FIPS,
+    common_fields.CommonFields.AGGREGATE_LEVEL,
+    common_fields.CommonFields.COUNTRY,
+    common_fields.CommonFields.STATE,
+    common_fields.CommonFields.COUNTY,
+]
+
+
+def categorize_location_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns `df` with the location columns it has converted to the category dtype.
+
+    Each distinct value is stored once instead of once per row. The values written by
+    `common_df.write_csv` are unchanged.
+    """
+    return df.astype({col: "category" for col in _LOCATION_COLUMNS if col in df.columns})
+
+
+def download_if_changed(url: str, path: pathlib.Path) -> bool:
+    """Downloads `url` to `path` unless the server reports that the copy at `path` is current.
+
+    The ETag of the download is stored next to `path` and sent in a conditional request the next
+    time so an unchanged file is not transferred again.
+
+    Returns: True if `path` was written.
+    """
+    etag_path = path.with_name(path.name + ".etag")
+    headers = {}
+    if path.exists() and etag_path.exists():
+        headers["If-None-Match"] = etag_path.read_text()
+    with HTTP_SESSION.get(url, headers=headers, stream=True) as response:
+        if response.status_code == http.HTTPStatus.NOT_MODIFIED:
+            return False
+        response.raise_for_status()
+        response.raw.decode_content = True
+        # Stream the body to disk instead of holding it in memory. It is written to a temporary
+        # file first so that a failed download doesn't leave a partial file next to the old ETag.
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as tmp_file:
+            shutil.copyfileobj(response.raw, tmp_file, length=_DOWNLOAD_CHUNK_SIZE)
+        # A connection dropped in the middle of the body ends the copy without an error. Check
+        # the size so that a truncated file is never stored with the ETag of the complete one.
+        # `tell` counts the bytes received, before any Content-Encoding is decoded.
+        content_length = response.headers.get("Content-Length")
+        if content_length is not None and response.raw.tell() != int(content_length):
+            tmp_path.unlink()
+            raise IOError(
+                f"Received {response.raw.tell()} of {content_length} bytes downloading {url}"
+            )
+        tmp_path.replace(path)
+    etag = response.headers.get("ETag")
+    if etag:
+        etag_path.write_text(etag)
+    elif etag_path.exists():
+        etag_path.unlink()
+    return True
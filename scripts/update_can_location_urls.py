@@ -2,11 +2,11 @@ import pathlib
 
 import structlog
 import click
-import requests
 import pandas as pd
 from covidactnow.datapublic import common_init
 from covidactnow.datapublic import common_df
 from covidactnow.datapublic.common_fields import CommonFields
+from scripts import helpers
 
 
 DATASET_URL = (
@@ -20,7 +20,7 @@ CSV_PATH = DATA_ROOT / "misc" / "can_location_page_urls.csv"
 def load_dataset():
 
     rows_by_fips = {}
-    data = requests.get(DATASET_URL).json()
+    data = helpers.HTTP_SESSION.get(DATASET_URL).json()
 
     for row in data["state_dataset"]:
         fips = row["state_fips_code"]
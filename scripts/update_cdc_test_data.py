@@ -2,6 +2,7 @@ import enum
 import pathlib
 
 import click
+import numpy as np
 import pandas as pd
 import structlog
 
@@ -15,8 +16,6 @@ from scripts import ccd_helpers
 
 Fields = ccd_helpers.Fields
 
-DATA_URL = "https://storage.googleapis.com/can-scrape-outputs/final/can_scrape_api_covid_us.parquet"
-
 DATA_ROOT = pathlib.Path(__file__).parent.parent / "data"
 COUNTY_DATA_PATH = DATA_ROOT / "misc" / "fips_population.csv"
 OUTPUT_PATH = DATA_ROOT / "testing-cdc" / "timeseries-common.csv"
@@ -26,72 +25,79 @@ DC_COUNTY_FIPS = "11001"
 DC_STATE_FIPS = "11"
 
 
-def _remove_trailing_zeros(series: pd.Series) -> pd.Series:
-
-    series = series.copy()
-
-    index = series.loc[series != 0].last_valid_index()
-
-    if index is None:
-        # If test positivity is 0% the entire time, considering the data inaccurate, returning
-        # none.
-        series[:] = None
-        return series
-
-    series[index + pd.DateOffset(1) :] = None
-    return series
-
-
 def remove_trailing_zeros(data: pd.DataFrame) -> pd.DataFrame:
-    data = data.sort_values([CommonFields.FIPS, CommonFields.DATE]).set_index(CommonFields.DATE)
-    test_pos = data.groupby(CommonFields.FIPS)[CommonFields.TEST_POSITIVITY_7D].apply(
-        _remove_trailing_zeros
-    )
-    data[CommonFields.TEST_POSITIVITY_7D] = test_pos
-    return data.reset_index()
+    """Removes test positivity values after the last non-zero value of each FIPS.
+
+    If test positivity is 0% the entire time the data is considered inaccurate and all values of
+    the FIPS are removed.
+    """
+    # Sort the FIPS integer codes instead of comparing the FIPS str objects. Rows of each FIPS are
+    # then contiguous and in date order.
+    fips_codes, _ = pd.factorize(data[CommonFields.FIPS], sort=True)
+    order = np.lexsort((data[CommonFields.DATE].to_numpy(), fips_codes))
+    data = data.iloc[order].reset_index(drop=True)
+    fips_codes = fips_codes[order]
+    if not len(data):
+        return data
+
+    test_pos = data[CommonFields.TEST_POSITIVITY_7D]
+    row_index = np.arange(len(data))
+    # For each FIPS find the index of the last row with a non-zero value, or -1 if there is none,
+    # and keep only the rows at or before it.
+    nonzero_index = np.where(test_pos.notna() & (test_pos != 0), row_index, -1)
+    group_starts = np.flatnonzero(np.diff(fips_codes, prepend=-2))
+    last_nonzero_index = np.maximum.reduceat(nonzero_index, group_starts)
+    group_sizes = np.diff(group_starts, append=len(data))
+    keep = row_index <= np.repeat(last_nonzero_index, group_sizes)
+    data[CommonFields.TEST_POSITIVITY_7D] = test_pos.where(keep)
+    return data
+
+
+VARIABLES = [
+    ccd_helpers.ScraperVariable(
+        variable_name="pcr_tests_positive",
+        measurement="rolling_average_7_day",
+        provider="cdc",
+        unit="percentage",
+        common_field=CommonFields.TEST_POSITIVITY_7D,
+    ),
+]
 
 
 def transform(dataset: ccd_helpers.CovidCountyDataset):
-
-    variables = [
-        ccd_helpers.ScraperVariable(
-            variable_name="pcr_tests_positive",
-            measurement="rolling_average_7_day",
-            provider="cdc",
-            unit="percentage",
-            common_field=CommonFields.TEST_POSITIVITY_7D,
-        ),
-    ]
-    results = dataset.query_multiple_variables(variables)
+    results = dataset.query_multiple_variables(VARIABLES)
     # Test positivity should be a ratio
-    results.loc[:, CommonFields.TEST_POSITIVITY_7D] = (
-        results.loc[:, CommonFields.TEST_POSITIVITY_7D] / 100.0
-    )
+    results[CommonFields.TEST_POSITIVITY_7D] = results[CommonFields.TEST_POSITIVITY_7D] / 100.0
     # Should only be picking up county all_df for now.  May need additional logic if states
     # are included as well
-    assert (results[CommonFields.FIPS].str.len() == 5).all()
+    assert all(len(fips) == 5 for fips in results[CommonFields.FIPS].unique())
 
     # Duplicating DC County results as state results because of a downstream
     # use of how dc state data is used to override DC county data.
-    dc_results = results.loc[results[CommonFields.FIPS] == DC_COUNTY_FIPS, :].copy()
-    dc_results.loc[:, CommonFields.FIPS] = DC_STATE_FIPS
-    dc_results.loc[:, CommonFields.AGGREGATE_LEVEL] = "state"
+    dc_results = results.loc[results[CommonFields.FIPS] == DC_COUNTY_FIPS].assign(
+        **{CommonFields.FIPS: DC_STATE_FIPS, CommonFields.AGGREGATE_LEVEL: "state"}
+    )
 
-    results = pd.concat([results, dc_results])
+    results = pd.concat([results, dc_results], ignore_index=True)
 
-    return remove_trailing_zeros(results)
+    return helpers.categorize_location_columns(remove_trailing_zeros(results))
 
 
 @click.command()
 @click.option("--fetch/--no-fetch", default=True)
-def main(fetch: bool):
+@click.option("--write-csv/--no-write-csv", default=True)
+@click.option("--write-parquet/--no-write-parquet", default=False)
+def main(fetch: bool, write_csv: bool, write_parquet: bool):
     common_init.configure_logging()
     log = structlog.get_logger()
 
-    ccd_dataset = ccd_helpers.CovidCountyDataset.load(fetch=fetch)
+    ccd_dataset = ccd_helpers.CovidCountyDataset.load(fetch=fetch, variables=VARIABLES)
     all_df = transform(ccd_dataset)
 
-    common_df.write_csv(all_df, OUTPUT_PATH, log)
+    if write_csv:
+        common_df.write_csv(all_df, OUTPUT_PATH, log)
+    if write_parquet:
+        common_df.write_parquet(all_df, OUTPUT_PATH.with_suffix(".parquet"), log)
 
 
 if __name__ == "__main__":
@@ -20,41 +20,41 @@ COUNTY_DATA_PATH = DATA_ROOT / "misc" / "fips_population.csv"
 OUTPUT_PATH = DATA_ROOT / "vaccines-cdc" / "timeseries-common.csv"
 
 
-def transform(dataset: ccd_helpers.CovidCountyDataset):
+VARIABLES = [
+    ccd_helpers.ScraperVariable(
+        variable_name="total_vaccine_allocated",
+        measurement="cumulative",
+        unit="doses",
+        provider="cdc",
+        common_field=CommonFields.VACCINES_ALLOCATED,
+    ),
+    ccd_helpers.ScraperVariable(
+        variable_name="total_vaccine_distributed",
+        measurement="cumulative",
+        unit="doses",
+        provider="cdc",
+        common_field=CommonFields.VACCINES_DISTRIBUTED,
+    ),
+    ccd_helpers.ScraperVariable(
+        variable_name="total_vaccine_initiated",
+        measurement="cumulative",
+        unit="people",
+        provider="cdc",
+        common_field=CommonFields.VACCINATIONS_INITIATED,
+    ),
+    ccd_helpers.ScraperVariable(
+        variable_name="total_vaccine_completed",
+        measurement="cumulative",
+        unit="people",
+        provider="cdc",
+        common_field=CommonFields.VACCINATIONS_COMPLETED,
+    ),
+]
 
-    variables = [
-        ccd_helpers.ScraperVariable(
-            variable_name="total_vaccine_allocated",
-            measurement="cumulative",
-            unit="doses",
-            provider="cdc",
-            common_field=CommonFields.VACCINES_ALLOCATED,
-        ),
-        ccd_helpers.ScraperVariable(
-            variable_name="total_vaccine_distributed",
-            measurement="cumulative",
-            unit="doses",
-            provider="cdc",
-            common_field=CommonFields.VACCINES_DISTRIBUTED,
-        ),
-        ccd_helpers.ScraperVariable(
-            variable_name="total_vaccine_initiated",
-            measurement="cumulative",
-            unit="people",
-            provider="cdc",
-            common_field=CommonFields.VACCINATIONS_INITIATED,
-        ),
-        ccd_helpers.ScraperVariable(
-            variable_name="total_vaccine_completed",
-            measurement="cumulative",
-            unit="people",
-            provider="cdc",
-            common_field=CommonFields.VACCINATIONS_COMPLETED,
-        ),
-    ]
 
-    results = dataset.query_multiple_variables(variables)
-    return results
+def transform(dataset: ccd_helpers.CovidCountyDataset):
+    results = dataset.query_multiple_variables(VARIABLES)
+    return helpers.categorize_location_columns(results)
 
 
 @click.command()
@@ -63,7 +63,7 @@ def main(fetch: bool):
     common_init.configure_logging()
     log = structlog.get_logger()
 
-    ccd_dataset = ccd_helpers.CovidCountyDataset.load(fetch=fetch)
+    ccd_dataset = ccd_helpers.CovidCountyDataset.load(fetch=fetch, variables=VARIABLES)
     all_df = transform(ccd_dataset)
 
     common_df.write_csv(all_df, OUTPUT_PATH, log)
@@ -25,18 +25,21 @@ fragile:
     fragile.
 """
 
+import concurrent.futures
 from datetime import datetime
 import enum
 import os
 import pathlib
 import re
+import shutil
+import tempfile
 import zipfile
 
 from bs4 import BeautifulSoup
 import click
 import numpy as np
 import pandas as pd
-import requests
+import python_calamine
 import structlog
 
 from covidactnow.datapublic import common_df
@@ -57,6 +60,29 @@ ARCHIVE_INDEX_HTML_URL = "https://data.cms.gov/stories/s/q5r5-gjyu"
 
 _logger = structlog.getLogger()
 
+_MAX_DOWNLOAD_WORKERS = 16
+
+# The column names of a CMS dataset are expected in one of the first rows of the excel file.
+_MAX_HEADER_ROW_INDEX = 10
+
+# Extracts the date from the name of a link to a dataset, e.g. "... Week Ending 10/06/20".
+_WEEK_ENDING_RE = re.compile(r".*Week Ending (.*)")
+# Extracts the date from the name of a downloaded dataset, e.g. "2020-10-06.zip".
+_DATASET_ZIP_RE = re.compile(r"(.*)\.zip")
+
+
+def _download_dataset(url: str, dest_path: pathlib.Path):
+    _logger.info("Fetching dataset", {"url": url, "dest": dest_path})
+    with helpers.HTTP_SESSION.get(url, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        # Write to a temporary file first so that a failed download doesn't leave a partial zip
+        # that looks like a complete dataset.
+        tmp_path = dest_path.with_name(dest_path.name + ".tmp")
+        with tmp_path.open("wb") as tmp_file:
+            shutil.copyfileobj(response.raw, tmp_file)
+        tmp_path.replace(dest_path)
+
 
 def update_datasets():
     ARCHIVE_DATASETS_PATH.mkdir(parents=True, exist_ok=True)
@@ -69,26 +95,27 @@ def update_datasets():
         "Fetching datasets archive html page",
         {"url": ARCHIVE_INDEX_HTML_URL, "local_path": ARCHIVE_INDEX_HTML_PATH},
     )
-    response = requests.get(ARCHIVE_INDEX_HTML_URL)
+    response = helpers.HTTP_SESSION.get(ARCHIVE_INDEX_HTML_URL)
     ARCHIVE_INDEX_HTML_PATH.write_bytes(response.content)
     page = BeautifulSoup(response.text, "html.parser")
-    links = page.find_all("a")
-    datasets = [
-        (link.string, link["href"]) for link in links if "data.cms.gov/download" in link.get("href")
-    ]
+    links = page.select('a[href*="data.cms.gov/download"]')
+    datasets = [(link.string, link["href"]) for link in links]
 
-    # Download them all.
+    urls = []
+    dest_paths = []
     for name, url in datasets:
         # Extract the dataset date from the name extracted from the link
         # and use it as the destination filename.
-        date_string = re.match(".*Week Ending (.*)", name).group(1)
+        date_string = _WEEK_ENDING_RE.match(name).group(1)
         date = datetime.strptime(date_string, "%m/%d/%y").date()
         dest_file_name = date.strftime("%Y-%m-%d") + ".zip"
-        dest_path = ARCHIVE_DATASETS_PATH / dest_file_name
+        urls.append(url)
+        dest_paths.append(ARCHIVE_DATASETS_PATH / dest_file_name)
 
-        _logger.info("Fetching dataset", {"url": url, "dest": dest_path})
-        response = requests.get(url)
-        dest_path.write_bytes(response.content)
+    # Download them all. The downloads are I/O bound so run them in parallel threads.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_MAX_DOWNLOAD_WORKERS) as executor:
+        # Consume the iterator so that exceptions are raised.
+        list(executor.map(_download_dataset, urls, dest_paths))
 
     # Update version.txt file.
     VERSION_PATH.write_text(f"Updated at {helpers.version_timestamp()}\n")
@@ -108,40 +135,75 @@ class Fields(GetByValueMixin, FieldNameAndCommonField, enum.Enum):
     POSITIVITY_CLASSIFICATION = "Test Positivity Classification - 14 days", None
 
 
+# Columns of the DataFrame returned by `transform_cms_dataset`. Every dataset has the same columns
+# in the same order so they can be concatenated without re-aligning.
+COMMON_COLUMNS = [
+    CommonFields.DATE,
+    CommonFields.FIPS,
+    CommonFields.COUNTRY,
+    CommonFields.STATE,
+    CommonFields.COUNTY,
+    CommonFields.AGGREGATE_LEVEL,
+    CommonFields.TEST_POSITIVITY_14D,
+]
+
+
 def transform_cms_datasets() -> pd.DataFrame:
     """Reads the per-date CMS datasets and transforms / merges them into a single "common" DataFrame."""
 
-    common_dataframes = []
-    for dataset_zip in filter(lambda f: f.endswith(".zip"), os.listdir(ARCHIVE_DATASETS_PATH)):
-        _logger.info("Parsing dataset", {"file": dataset_zip})
-        date_string = re.match("(.*).zip", dataset_zip).group(1)
-        date = datetime.strptime(date_string, "%Y-%m-%d").date()
-        df = read_cms_dataset_from_zip(ARCHIVE_DATASETS_PATH / dataset_zip)
-        common_dataframes.append(transform_cms_dataset(date, df))
+    dataset_zips = sorted(f for f in os.listdir(ARCHIVE_DATASETS_PATH) if f.endswith(".zip"))
+    # Parsing xlsx files is CPU bound so spread the files across processes.
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        common_dataframes = list(executor.map(_read_and_transform_cms_dataset, dataset_zips))
+
+    return pd.concat(common_dataframes, ignore_index=True, sort=False, copy=False)
+
 
-    return pd.concat(common_dataframes)
+def _read_and_transform_cms_dataset(dataset_zip: str) -> pd.DataFrame:
+    """Reads and transforms one dataset in ARCHIVE_DATASETS_PATH. Run in a worker process."""
+    _logger.info("Parsing dataset", {"file": dataset_zip})
+    date_string = _DATASET_ZIP_RE.match(dataset_zip).group(1)
+    date = datetime.strptime(date_string, "%Y-%m-%d").date()
+    df = read_cms_dataset_from_zip(ARCHIVE_DATASETS_PATH / dataset_zip)
+    return transform_cms_dataset(date, df)
 
 
 def read_cms_dataset_from_zip(zip_path: pathlib.Path) -> pd.DataFrame:
     """Finds and reads the Excel file within the CMS dataset zip file."""
-    zip = zipfile.ZipFile(zip_path)
-    excel_files = [
-        f for f in zip.filelist if f.filename.endswith(".xlsx") and "__MACOSX" not in f.filename
-    ]
-    assert len(excel_files) == 1
+    with zipfile.ZipFile(zip_path) as zip, tempfile.TemporaryDirectory() as tmp_dir:
+        excel_files = [
+            f for f in zip.filelist if f.filename.endswith(".xlsx") and "__MACOSX" not in f.filename
+        ]
+        assert len(excel_files) == 1
+        # python-calamine parses xlsx files much faster than pd.read_excel but can only read a
+        # file at a path.
+        excel_path = zip.extract(excel_files[0], tmp_dir)
+        rows = python_calamine.get_sheet_data(excel_path, 0)
 
     # HACK: The excel file has some "header" rows at the top before the columns are defined.
     # Unfortunately, the number of header rows has changed over time, and so we don't know how
-    # many there will be. So we try parsing the file repeatedly with different numbers of header
-    # rows until we successfully parse out a "County" column, which should always be present.
-    for headers in range(5, 8):
-        df = pd.read_excel(zip.read(excel_files[0]), header=headers)
-        if "County" in df.columns:
+    # many there will be. So we look for the first row with a "County" column, which should
+    # always be present.
+    for header_index, row in enumerate(rows[:_MAX_HEADER_ROW_INDEX]):
+        if "County" in row:
             break
     else:
         raise AssertionError("Failed to read data out of excel file in " + str(zip_path))
 
-    return df
+    columns = rows[header_index]
+    data = [[_convert_excel_value(value) for value in row] for row in rows[header_index + 1 :]]
+    df = pd.DataFrame(data, columns=columns).dropna(how="all")
+    # Drop columns without a name, which contain no data.
+    return df.loc[:, [column != "" for column in columns]]
+
+
+def _convert_excel_value(value):
+    """Converts a value returned by python-calamine to what pd.read_excel returns."""
+    if value == "":
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
 
 
 def transform_cms_dataset(date: datetime.date, df: pd.DataFrame) -> pd.DataFrame:
@@ -163,13 +225,15 @@ def transform_cms_dataset(date: datetime.date, df: pd.DataFrame) -> pd.DataFrame
         }
     )
 
-    # Make sure FIPS is a 0-padded string.
-    df[Fields.FIPS_CODE.value] = df[Fields.FIPS_CODE.value].map(lambda fips: f"{fips:05}")
+    # Make sure FIPS is a 0-padded string. FIPS read as floats are converted to int first so 1001.0
+    # becomes "01001". Missing and non-numeric FIPS, such as a footnote, become missing.
+    fips = pd.to_numeric(df[Fields.FIPS_CODE.value], errors="coerce").dropna().astype(np.int64)
+    df[Fields.FIPS_CODE.value] = fips.astype(str).str.zfill(5).reindex(df.index)
 
     # Remove non-numeric test positivity entries (e.g. "<10 tests")
-    df[Fields.TEST_POSITIVITY.value] = df[Fields.TEST_POSITIVITY.value].map(
-        lambda pct: pct if type(pct) == float else np.nan
-    )
+    df[Fields.TEST_POSITIVITY.value] = pd.to_numeric(
+        df[Fields.TEST_POSITIVITY.value], errors="coerce"
+    ).astype(float)
 
     # Rename to common fields.
     # NOTE: This will raise some warnings because some of the older datasets
@@ -182,7 +246,7 @@ def transform_cms_dataset(date: datetime.date, df: pd.DataFrame) -> pd.DataFrame
     # Add date
     df[CommonFields.DATE] = date
 
-    return df
+    return df.reindex(columns=COMMON_COLUMNS, copy=False)
 
 
 @click.command()
@@ -2,10 +2,10 @@ import datetime
 import enum
 import pathlib
 
+import numpy as np
 import pandas as pd
 import click
 import pytz
-import requests
 import structlog
 
 from covidactnow.datapublic import common_df
@@ -22,6 +22,19 @@ STATIC_CSV_PATH = COVID_CARE_MAP_ROOT / "static.csv"
 
 STATE_TO_FIPS = us.states.mapping(from_field="abbr", to_field="fips")
 
+ICU_BEDS_OVERRIDES = pd.Series(
+    {
+        # Override Washoe County ICU capacity with actual numbers.
+        "32031": 162,
+        # Overriding NV ICU capacity numbers with actuals
+        STATE_TO_FIPS["NV"]: 844,
+        # According to the Utah Department of Health, they only have possible staff for
+        # 85% of the ICU bed listed. This reproduces
+        # https://github.com/covid-projections/covid-data-public/commit/be79d85e1aaa058f4c5d0a472c84047b59d7f3d8
+        STATE_TO_FIPS["UT"]: 564,
+    }
+)
+
 
 @enum.unique
 class StateFields(GetByValueMixin, FieldNameAndCommonField, enum.Enum):
@@ -51,6 +64,19 @@ class CountyFields(GetByValueMixin, FieldNameAndCommonField, enum.Enum):
     ICU_TYPICAL_OCCUPANCY_RATE = "ICU Bed Occupancy Rate", CommonFields.ICU_TYPICAL_OCCUPANCY_RATE
 
 
+def _read_csv(path: pathlib.Path, fields) -> pd.DataFrame:
+    """Reads only the columns in `fields` from the CSV at `path`.
+
+    The column types are set explicitly instead of being inferred from the values.
+    """
+    columns = {f.value for f in fields}
+    dtype = {f.value: float for f in fields}
+    for field in fields:
+        if field.common_field in (CommonFields.FIPS, CommonFields.STATE, CommonFields.COUNTY):
+            dtype[field.value] = str
+    return pd.read_csv(path, usecols=lambda column: column in columns, dtype=dtype)
+
+
 class CovidCareMapUpdater(object):
     """Updates the covid care map data."""
 
@@ -83,10 +109,11 @@ class CovidCareMapUpdater(object):
 
     def update(self):
         structlog.get_logger().info("Updating Covid Care Map data.")
-        response = requests.get(self.COUNTY_DATA_URL)
-        self.output_path.write_bytes(response.content)
-        response = requests.get(self.STATE_DATA_URL)
-        self.state_output_path.write_bytes(response.content)
+        county_changed = helpers.download_if_changed(self.COUNTY_DATA_URL, self.output_path)
+        state_changed = helpers.download_if_changed(self.STATE_DATA_URL, self.state_output_path)
+        if not (county_changed or state_changed):
+            structlog.get_logger().info("Covid Care Map data not modified.")
+            return
 
         version_path = self.version_path
         version_path.write_text(f"Updated at {self._stamp()}\n")
@@ -94,47 +121,38 @@ class CovidCareMapUpdater(object):
     def transform(self) -> pd.DataFrame:
         log = structlog.get_logger()
 
-        state_df = pd.read_csv(self.state_output_path)
+        state_df = _read_csv(self.state_output_path, StateFields)
         state_df = helpers.rename_fields(
             state_df, StateFields, set(), log, check_extra_fields=False
         )
         state_df[CommonFields.FIPS] = state_df[CommonFields.STATE].map(STATE_TO_FIPS)
         state_df[CommonFields.AGGREGATE_LEVEL] = "state"
 
-        county_df = pd.read_csv(self.output_path, dtype={CountyFields.FIPS: str})
+        county_df = _read_csv(self.output_path, CountyFields)
         county_df = helpers.rename_fields(
             county_df, CountyFields, set(), log, check_extra_fields=False
         )
         county_df[CommonFields.AGGREGATE_LEVEL] = "county"
 
         all_df = pd.concat([county_df, state_df])
-        dups = all_df.duplicated(CommonFields.FIPS)
-        if dups.any():
-            raise ValueError(f"Unexpected duplicate fips\n{all_df.loc[dups, :]}")
-
+        # Raises ValueError listing the duplicated FIPS, if any.
         all_df = all_df.set_index([CommonFields.FIPS], verify_integrity=True)
 
         all_df[CommonFields.COUNTRY] = "USA"
 
-        # Override Washoe County ICU capacity with actual numbers.
-        all_df.at["32031", CommonFields.ICU_BEDS] = 162
+        all_df.loc[ICU_BEDS_OVERRIDES.index, CommonFields.ICU_BEDS] = ICU_BEDS_OVERRIDES
 
-        # Overriding NV ICU capacity numbers with actuals
-        all_df.at[STATE_TO_FIPS["NV"], CommonFields.ICU_BEDS] = 844
-
-        # According to the Utah Department of Health, they only have possible staff for
-        # 85% of the ICU bed listed. This reproduces
-        # https://github.com/covid-projections/covid-data-public/commit/be79d85e1aaa058f4c5d0a472c84047b59d7f3d8
-        all_df.at[STATE_TO_FIPS["UT"], CommonFields.ICU_BEDS] = 564
-
-        all_df[CommonFields.MAX_BED_COUNT] = all_df[
-            [CommonFields.STAFFED_BEDS, CommonFields.LICENSED_BEDS]
-        ].max(axis=1)
+        # fmax ignores NaN like DataFrame.max but compares the two columns without the per-row
+        # reduction.
+        all_df[CommonFields.MAX_BED_COUNT] = np.fmax(
+            all_df[CommonFields.STAFFED_BEDS].to_numpy(),
+            all_df[CommonFields.LICENSED_BEDS].to_numpy(),
+        )
 
         # The virgin islands do not currently have associated fips codes.
         # if VI is supported in the future, this should be removed.
         is_virgin_islands = all_df[CommonFields.STATE] == "VI"
-        return all_df.loc[~is_virgin_islands, :]
+        return helpers.categorize_location_columns(all_df.loc[~is_virgin_islands, :])
 
 
 @click.command()
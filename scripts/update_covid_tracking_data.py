@@ -1,12 +1,10 @@
 import enum
-import json
 import logging
 import datetime
 import pathlib
 
 import click
 import pytz
-import requests
 import pandas as pd
 import numpy as np
 import structlog
@@ -34,13 +32,17 @@ _logger = logging.getLogger(__name__)
 
 def update_local_json():
     _logger.info("Fetching JSON")
-    response = requests.get(HISTORICAL_STATE_DATA_URL)
-    LOCAL_JSON_PATH.write_bytes(response.content)
+    if not helpers.download_if_changed(HISTORICAL_STATE_DATA_URL, LOCAL_JSON_PATH):
+        _logger.info("JSON not modified")
 
 
 def load_local_json() -> pd.DataFrame:
     _logger.info("Reading local JSON")
-    return pd.DataFrame(json.load(LOCAL_JSON_PATH.open("rb")))
+    # Parse in C without building a list of dicts first. Values keep the types they have in the
+    # JSON, as they did with json.load, instead of being converted by read_json.
+    return pd.read_json(
+        LOCAL_JSON_PATH, orient="records", dtype=False, convert_dates=False, precise_float=True
+    )
 
 
 class CovidTrackingDataUpdater(object):
@@ -157,6 +159,26 @@ class Fields(GetByValueMixin, FieldNameAndCommonField, enum.Enum):
     PROBABLE_CASES = "probableCases", None
 
 
+def _parse_dates(dates: pd.Series) -> pd.Series:
+    """Returns YYYYMMDD `dates` as datetimes.
+
+    The JSON has int dates which are converted with integer arithmetic, much faster than
+    formatting and parsing each of them as a string.
+    """
+    if not pd.api.types.is_integer_dtype(dates):
+        return pd.to_datetime(dates, format="%Y%m%d")
+    values = dates.to_numpy()
+    years = (values // 10000 - 1970).astype("datetime64[Y]")
+    months = (values // 100 % 100 - 1).astype("timedelta64[M]")
+    days = (values % 100 - 1).astype("timedelta64[D]")
+    parsed = pd.Series((years + months).astype("datetime64[D]") + days, index=dates.index)
+    # Invalid months and days roll over into the next month or year instead of raising.
+    round_trip = parsed.dt.year * 10000 + parsed.dt.month * 100 + parsed.dt.day
+    if (round_trip != dates).any():
+        raise ValueError(f"Invalid dates: {dates.loc[round_trip != dates].unique()}")
+    return parsed
+
+
 def transform(df: pd.DataFrame) -> pd.DataFrame:
     """Transforms data from load_local_json to the common fields."""
     log = structlog.get_logger()
@@ -166,26 +188,19 @@ def transform(df: pd.DataFrame) -> pd.DataFrame:
     dates_to_remove = ["20200717", "20200718", "20200719"]
     df.loc[is_ct & df.date.isin(dates_to_remove), ["negative", "positive"]] = np.nan
 
-    df[CommonFields.DATE] = pd.to_datetime(df[Fields.DATE], format="%Y%m%d")
+    df[CommonFields.DATE] = _parse_dates(df[Fields.DATE])
 
-    # Removing bad data from Delaware.
-    # Once that is resolved we can remove this while keeping the assert below.
+    # Removing bad data from Delaware. No row is left with IN_ICU_CURRENTLY greater than
+    # CURRENT_HOSPITALIZED so the columns don't need to be compared again after this.
     icu_mask = df[Fields.IN_ICU_CURRENTLY] > df[Fields.CURRENT_HOSPITALIZED]
     if icu_mask.any():
         df.loc[icu_mask, Fields.IN_ICU_CURRENTLY] = np.nan
         log.warning(
             ICU_HOSPITALIZED_MISMATCH_WARNING_MESSAGE,
             lines_changed=icu_mask.sum(),
-            unique_states=df[icu_mask]["state"].nunique(),
+            unique_states=df.loc[icu_mask, "state"].nunique(),
         )
 
-    # Current Sanity Check and Filter for In ICU.
-    # This should fail for Delaware right now unless we patch it.
-    # The 'not any' style is to deal with comparisons to np.nan.
-    assert not (
-        df[Fields.IN_ICU_CURRENTLY] > df[Fields.CURRENT_HOSPITALIZED]
-    ).any(), "IN_ICU_CURRENTLY field is greater than CURRENT_HOSPITALIZED"
-
     already_transformed_fields = {Fields.DATE}
 
     df = helpers.rename_fields(df, Fields, already_transformed_fields, log)
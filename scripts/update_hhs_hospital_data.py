@@ -1,6 +1,11 @@
 import enum
+import functools
 import pathlib
+
+import click
+import numpy as np
 import pandas as pd
+import pyarrow.dataset
 import structlog
 import us
 
@@ -11,13 +16,17 @@ from covidactnow.datapublic.common_fields import CommonFields
 from covidactnow.datapublic.common_fields import FieldNameAndCommonField
 from covidactnow.datapublic.common_fields import GetByValueMixin
 
+from scripts import ccd_helpers
 from scripts import helpers
 
 DATA_ROOT = pathlib.Path(__file__).parent.parent / "data"
 COUNTY_DATA_PATH = DATA_ROOT / "misc" / "fips_population.csv"
 OUTPUT_PATH = DATA_ROOT / "hospital-hhs" / "timeseries-common.csv"
 
-DATA_URL = "https://storage.googleapis.com/can-scrape-outputs/final/can_scrape_api_covid_us.parquet"
+# us.states.mapping doesn't include DC unless it is a state so it is added explicitly.
+FIPS_TO_STATE = us.states.mapping(
+    from_field="fips", to_field="abbr", states=us.states.STATES_AND_TERRITORIES + [us.states.DC]
+)
 
 _logger = structlog.getLogger()
 
@@ -39,6 +48,21 @@ CUSTOM_START_DATES = {
 }
 
 
+@functools.lru_cache(maxsize=None)
+def _read_county_metadata() -> pd.DataFrame:
+    census_data = census_data_helpers.load_county_fips_data(COUNTY_DATA_PATH).data
+    return census_data.set_index(CommonFields.FIPS)[[CommonFields.COUNTY, CommonFields.STATE]]
+
+
+def _load_county_metadata() -> pd.DataFrame:
+    """Returns the COUNTY and STATE of each county, indexed by FIPS.
+
+    The census data is read once. Each call returns a copy so the cached DataFrame can't be
+    modified by a caller.
+    """
+    return _read_county_metadata().copy()
+
+
 @enum.unique
 class Fields(GetByValueMixin, FieldNameAndCommonField, enum.Enum):
     PROVIDER = "provider", None
@@ -60,11 +84,10 @@ class Fields(GetByValueMixin, FieldNameAndCommonField, enum.Enum):
     HOSPITAL_BEDS_IN_USE_COVID = "hospital_beds_in_use_covid", CommonFields.CURRENT_HOSPITALIZED
 
 
-def update(data_url: str):
+def update(fetch: bool):
 
-    # TODO(tom): Switch to ccd_helpers. See
-    #  https://github.com/covid-projections/covid-data-public/pull/196
-    all_df = pd.read_parquet(data_url)
+    if fetch:
+        ccd_helpers.fetch_data()
 
     variables = [
         "adult_icu_beds_capacity",
@@ -77,80 +100,99 @@ def update(data_url: str):
     unit = "beds"
     measurements = ["current", "rolling_average_7_day"]
 
+    # pyarrow.dataset.field rejects the str subclass values of Fields so the filter and columns
+    # are built from plain str column names.
+    column = {field: str(field.value) for field in Fields}
     is_federal_hospital_data = (
-        (all_df[Fields.PROVIDER] == "hhs")
-        & (all_df[Fields.VARIABLE_NAME].isin(variables))
-        & (all_df[Fields.MEASUREMENT].isin(measurements))
-        & (all_df[Fields.UNIT] == unit)
-        & (all_df[Fields.AGE] == "all")
-        & (all_df[Fields.RACE] == "all")
-        & (all_df[Fields.SEX] == "all")
+        (pyarrow.dataset.field(column[Fields.PROVIDER]) == "hhs")
+        & pyarrow.dataset.field(column[Fields.VARIABLE_NAME]).isin(variables)
+        & pyarrow.dataset.field(column[Fields.MEASUREMENT]).isin(measurements)
+        & (pyarrow.dataset.field(column[Fields.UNIT]) == unit)
+        & (pyarrow.dataset.field(column[Fields.AGE]) == "all")
+        & (pyarrow.dataset.field(column[Fields.RACE]) == "all")
+        & (pyarrow.dataset.field(column[Fields.SEX]) == "all")
     )
 
-    # Subset only to hospital data we want.
-    df = all_df.loc[is_federal_hospital_data].copy()
+    # Read only the hospital data we want. Row groups without any of it are skipped.
+    table = pyarrow.dataset.dataset(ccd_helpers.clustered_data_path(), format="parquet").to_table(
+        columns=[
+            column[Fields.LOCATION],
+            column[Fields.DATE],
+            column[Fields.VARIABLE_NAME],
+            column[Fields.VALUE],
+        ],
+        filter=is_federal_hospital_data,
+    )
+    df = table.to_pandas()
 
-    # Add FIPS column.
+    # Add FIPS column. Locations are state FIPS below 100 or county FIPS of at least 1000.
+    assert not df[Fields.LOCATION].between(100, 999).any()
     df[Fields.FIPS] = helpers.fips_from_int(df[Fields.LOCATION])
 
-    # Subset only to columns we want.
+    # Subset only to columns we want. Rows without a value are dropped, as pivot_table did, so that
+    # a (fips, date) without any values doesn't become an empty row.
     df = df[[Fields.FIPS, Fields.DATE, Fields.VARIABLE_NAME, Fields.VALUE]]
-
-    # Convert to wide using variable_name as the columns.
-    wide_df = df.pivot_table(
-        index=[Fields.FIPS.value, Fields.DATE.value],
-        columns=Fields.VARIABLE_NAME.value,
-        values=Fields.VALUE.value,
-    ).reset_index()
+    df = df.dropna(subset=[Fields.VALUE])
+
+    # Convert to wide using variable_name as the columns. A variable may have a value for both
+    # measurements on the same date so they are averaged, as pivot_table did, with a single groupby
+    # on the value column.
+    wide_df = (
+        df.groupby([Fields.FIPS.value, Fields.DATE.value, Fields.VARIABLE_NAME.value])[
+            Fields.VALUE.value
+        ]
+        .mean()
+        .unstack(Fields.VARIABLE_NAME.value)
+        .reset_index()
+    )
 
     # Rename to common fields.
     wide_df = helpers.rename_fields(wide_df, Fields, set(), _logger)
 
-    # Split counties and states.
-    counties_df = wide_df.loc[wide_df[Fields.FIPS].str.len() == 5].copy()
-    states_df = wide_df.loc[wide_df[Fields.FIPS].str.len() == 2].copy()
+    # Counties and states stay in one DataFrame and their metadata columns are filled in by FIPS
+    # length instead of splitting the rows and concatenating them again.
+    fips_len = wide_df[Fields.FIPS].str.len()
+    out_df = wide_df.loc[(fips_len == 5) | (fips_len == 2)].copy(deep=False)
+    fips = out_df[Fields.FIPS]
+    is_county = (fips_len.loc[out_df.index] == 5).to_numpy()
 
-    # Add county metadata.
-    census_data = census_data_helpers.load_county_fips_data(COUNTY_DATA_PATH).data
-    census_data = census_data.set_index(CommonFields.FIPS)
-    counties_df[CommonFields.COUNTY] = counties_df[Fields.FIPS].map(
-        census_data[CommonFields.COUNTY]
-    )
-    counties_df[CommonFields.STATE] = counties_df[Fields.FIPS].map(census_data[CommonFields.STATE])
-    counties_df[CommonFields.AGGREGATE_LEVEL] = "county"
+    # Add county metadata. State FIPS aren't in the census data so their county is NaN.
+    county_metadata = _load_county_metadata().reindex(fips.to_numpy())
+    out_df[CommonFields.COUNTY] = county_metadata[CommonFields.COUNTY].to_numpy()
 
     # Add state metadata.
-    states_df[CommonFields.STATE] = states_df[Fields.FIPS].apply(
-        lambda fips: us.states.lookup(fips).abbr
+    out_df[CommonFields.STATE] = np.where(
+        is_county, county_metadata[CommonFields.STATE].to_numpy(), fips.map(FIPS_TO_STATE)
+    )
+    out_df[CommonFields.AGGREGATE_LEVEL] = pd.Categorical.from_codes(
+        np.where(is_county, 0, 1), categories=["county", "state"]
     )
-    states_df[CommonFields.AGGREGATE_LEVEL] = "state"
-
-    # Merge counties and states back together.
-    out_df = pd.concat([counties_df, states_df])
 
     # Add country metadata.
     out_df[CommonFields.COUNTRY] = "USA"
 
     out_df = filter_early_data(out_df)
 
-    return out_df
+    return helpers.categorize_location_columns(out_df)
 
 
 def filter_early_data(df):
-    keep_rows = df[CommonFields.DATE.value] >= pd.to_datetime(DEFAULT_START_DATE)
-    df = df.loc[keep_rows]
+    # The start date of each row, looked up by FIPS so that all rows are compared in one pass.
+    start_dates = (
+        df[Fields.FIPS]
+        .map(pd.to_datetime(pd.Series(CUSTOM_START_DATES)))
+        .fillna(pd.to_datetime(DEFAULT_START_DATE))
+    )
+    return df.loc[df[CommonFields.DATE.value] >= start_dates]
 
-    for (fips, start_date) in CUSTOM_START_DATES.items():
-        keep_rows = (df[Fields.FIPS] != fips) | (
-            df[CommonFields.DATE] >= pd.to_datetime(start_date)
-        )
-        df = df.loc[keep_rows]
 
-    return df
+@click.command()
+@click.option("--fetch/--no-fetch", default=True)
+def main(fetch: bool):
+    common_init.configure_logging()
+    all_df = update(fetch)
+    common_df.write_csv(all_df, OUTPUT_PATH, _logger)
 
 
 if __name__ == "__main__":
-
-    common_init.configure_logging()
-    all_df = update(DATA_URL)
-    common_df.write_csv(all_df, OUTPUT_PATH, _logger)
+    main()  # pylint: disable=no-value-for-parameter
@@ -2,11 +2,11 @@
 # https://healthdata.gov/dataset/covid-19-diagnostic-laboratory-testing-pcr-testing-time-series
 
 import enum
+import json
 import os
 import pathlib
 
 import click
-import requests
 import pandas as pd
 import structlog
 
@@ -32,15 +32,15 @@ _logger = structlog.getLogger()
 def update_dataset_csv():
     # Fetch the JSON metadata to get the latest CSV url.
     _logger.info("Fetching metadata JSON", {"url": METADATA_URL, "path": METADATA_JSON_PATH})
-    response = requests.get(METADATA_URL)
-    METADATA_JSON_PATH.write_bytes(response.content)
-    metadata = response.json()
+    helpers.download_if_changed(METADATA_URL, METADATA_JSON_PATH)
+    metadata = json.loads(METADATA_JSON_PATH.read_bytes())
 
     # Fetch the latest CSV.
     dataset_url = metadata["result"][0]["resources"][0]["url"]
     _logger.info("Fetching Dataset", {"url": dataset_url, "path": DATASET_CSV_PATH})
-    response = requests.get(dataset_url)
-    DATASET_CSV_PATH.write_bytes(response.content)
+    if not helpers.download_if_changed(dataset_url, DATASET_CSV_PATH):
+        _logger.info("Dataset not modified", {"url": dataset_url})
+        return
 
     # Update version.txt file.
     VERSION_PATH.write_text(f"Updated at {helpers.version_timestamp()} from {dataset_url}\n")
@@ -68,17 +68,23 @@ class Fields(GetByValueMixin, FieldNameAndCommonField, enum.Enum):
 def transform(df: pd.DataFrame) -> pd.DataFrame:
     """Transforms data to the common fields."""
 
-    # We don't care about the inconclusive rows.
-    df = df.loc[df[Fields.OVERALL_OUTCOME] != "Inconclusive", :]
+    # We don't care about the inconclusive rows. Rows without a value are dropped as pivot_table
+    # did. Both are removed, along with the columns not needed by the pivot, in a single selection
+    # before pivoting.
+    index_columns = [Fields.STATE_FIPS, Fields.DATE, Fields.STATE, Fields.OVERALL_OUTCOME]
+    is_conclusive = df[Fields.OVERALL_OUTCOME] != "Inconclusive"
+    is_wanted = is_conclusive & df[Fields.TOTAL_RESULTS_REPORTED].notna()
+    df = df.loc[is_wanted, index_columns + [Fields.TOTAL_RESULTS_REPORTED]]
 
     # We need to pivot the data to be in wide format (with positive / negative
-    # as separate columns instead of as values in the overall_outcome column).
-    df = df.pivot_table(
-        index=[Fields.STATE_FIPS, Fields.DATE, Fields.STATE],
-        columns=Fields.OVERALL_OUTCOME,
-        values=Fields.TOTAL_RESULTS_REPORTED,
+    # as separate columns instead of as values in the overall_outcome column). Duplicate rows
+    # are averaged, as pivot_table did, with a single groupby on the value column.
+    df = (
+        df.groupby(index_columns)[Fields.TOTAL_RESULTS_REPORTED]
+        .mean()
+        .unstack(Fields.OVERALL_OUTCOME)
+        .reset_index()
     )
-    df = df.reset_index()
 
     already_transformed_fields = set()
     df = helpers.rename_fields(df, Fields, already_transformed_fields, _logger)
@@ -98,10 +104,13 @@ def main(replace_local_mirror: bool, generate_common_csv: bool):
         update_dataset_csv()
 
     if generate_common_csv:
+        columns = {f.value for f in Fields}
         dataset = pd.read_csv(
             DATASET_CSV_PATH,
+            # Skip parsing the columns that transform drops.
+            usecols=lambda column: column in columns,
             parse_dates=[Fields.DATE],
-            dtype={Fields.STATE_FIPS: str},
+            dtype={Fields.STATE_FIPS: str, Fields.STATE: str, Fields.OVERALL_OUTCOME: str},
             low_memory=False,
         )
 
@@ -7,7 +7,6 @@ import tempfile
 
 
 import pathlib
-import requests
 import pandas as pd
 import pydantic
 import structlog
@@ -303,7 +302,7 @@ class NYTimesUpdater(pydantic.BaseModel):
     def get_master_commit_sha(self) -> str:
         # Getting the master commit of the states file as the master URL may contain
         # changes not applicable to the files we download.
-        r = requests.get(self.NYTIMES_MASTER_API_URL_STATES)
+        r = helpers.HTTP_SESSION.get(self.NYTIMES_MASTER_API_URL_STATES)
         return r.json()["sha"]
 
     def write_version_file(self, git_sha) -> None:
@@ -328,10 +327,10 @@ class NYTimesUpdater(pydantic.BaseModel):
     def update_source_data(self):
         git_sha = self.get_master_commit_sha()
         _logger.info(f"Updating version file with nytimes revision {git_sha}")
-        state_data = requests.get(self.state_url).content
+        state_data = helpers.HTTP_SESSION.get(self.state_url).content
         self.state_path.write_bytes(state_data)
 
-        county_data = requests.get(self.county_url).content
+        county_data = helpers.HTTP_SESSION.get(self.county_url).content
         self.county_path.write_bytes(county_data)
         self.write_version_file(git_sha)
 
@@ -1,11 +1,16 @@
+import dataclasses
 from typing import Dict, List
 import io
 import datetime
 from covidactnow.datapublic.common_fields import CommonFields
 from covidactnow.datapublic import common_df
 import pandas as pd
+import pyarrow.parquet
+import pytest
+import structlog.testing
 
 from scripts import ccd_helpers
+from scripts import helpers
 
 
 # Match fields in the CAN Scraper DB
@@ -74,3 +79,215 @@ def test_query_multiple_variables():
     )
     expected = common_df.read_csv(expected_buf, set_index=False)
     pd.testing.assert_frame_equal(expected, results)
+
+
+def test_load_only_reads_requested_variables(tmp_path, monkeypatch):
+    variable = ccd_helpers.ScraperVariable(
+        variable_name="total_vaccine_completed",
+        measurement="cumulative",
+        unit="people",
+        provider="cdc",
+        common_field=CommonFields.VACCINATIONS_COMPLETED,
+    )
+    other_provider = dataclasses.replace(variable, provider="hhs")
+    other_variable = dataclasses.replace(variable, variable_name="total_vaccine_initiated")
+    other_age = dataclasses.replace(variable, age="0-17")
+    input_data = _build_can_scraper_dataframe(
+        {variable: [10, 20], other_provider: [30, 40], other_variable: [50, 60], other_age: [1, 2]}
+    )
+    input_data["location"] = input_data["location"].astype(int)
+    data_path = tmp_path / "can_scrape_api_covid_us.parquet"
+    input_data.to_parquet(data_path)
+    monkeypatch.setattr(ccd_helpers, "DATA_PATH", data_path)
+
+    dataset = ccd_helpers.CovidCountyDataset.load(fetch=False, variables=[variable])
+
+    all_df = dataset.timeseries_df
+    assert set(all_df[ccd_helpers.Fields.PROVIDER]) == {"cdc"}
+    assert set(all_df[ccd_helpers.Fields.VARIABLE_NAME]) == {"total_vaccine_completed"}
+    assert list(all_df[ccd_helpers.Fields.LOCATION]) == ["36", "36"]
+    assert all_df[ccd_helpers.Fields.VARIABLE_NAME].dtype == "category"
+    # Only rows with age, race and sex "all" were loaded.
+    assert not dataset.has_demographic_breakdown
+    results = dataset.query_multiple_variables([variable])
+    assert list(results[CommonFields.VACCINATIONS_COMPLETED]) == [10, 20]
+
+
+def test_query_multiple_variables_same_name_different_measurement():
+    people = ccd_helpers.ScraperVariable(
+        variable_name="total_vaccine_completed",
+        measurement="cumulative",
+        unit="people",
+        provider="cdc",
+        common_field=CommonFields.VACCINATIONS_COMPLETED,
+    )
+    percentage = ccd_helpers.ScraperVariable(
+        variable_name="total_vaccine_completed",
+        measurement="current",
+        unit="percentage",
+        provider="cdc",
+        common_field=CommonFields.VACCINATIONS_COMPLETED_PCT,
+    )
+    dropped = ccd_helpers.ScraperVariable(variable_name="total_vaccine_allocated", provider="cdc")
+
+    input_data = _build_can_scraper_dataframe({people: [10, 20], percentage: [1.5, 3]})
+    data = ccd_helpers.CovidCountyDataset(input_data)
+    results = data.query_multiple_variables([people, percentage, dropped])
+
+    expected_buf = io.StringIO(
+        "fips,date,aggregate_level,vaccinations_completed,vaccinations_completed_pct\n"
+        f"36,2021-01-01,state,10,1.5\n"
+        f"36,2021-01-02,state,20,3\n"
+    )
+    expected = common_df.read_csv(expected_buf, set_index=False)
+    pd.testing.assert_frame_equal(expected, results, check_dtype=False)
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_query_multiple_variables_logs_hint_for_missing_variable(categorical):
+    variable = ccd_helpers.ScraperVariable(
+        variable_name="total_vaccine_completed",
+        measurement="cumulative",
+        unit="people",
+        provider="cdc",
+        common_field=CommonFields.VACCINATIONS_COMPLETED,
+    )
+    other_unit = dataclasses.replace(variable, unit="doses")
+    missing = dataclasses.replace(
+        variable, unit="percentage", common_field=CommonFields.VACCINATIONS_COMPLETED_PCT
+    )
+
+    input_data = _build_can_scraper_dataframe({variable: [10, 20], other_unit: [30, 40, 50]})
+    if categorical:
+        # Add an unused category, like those of other providers in the real dataset.
+        input_data["unit"] = pd.Categorical(input_data["unit"], categories=["doses", "people", "x"])
+    data = ccd_helpers.CovidCountyDataset(input_data)
+    with structlog.testing.capture_logs() as logs:
+        results = data.query_multiple_variables(
+            [variable, missing], log_provider_coverage_warnings=True
+        )
+
+    assert list(results[CommonFields.VACCINATIONS_COMPLETED]) == [10, 20]
+    assert CommonFields.VACCINATIONS_COMPLETED_PCT not in results.columns
+    assert [l["event"] for l in logs] == ["No data rows found for variable", "Try these parameters"]
+    assert logs[0]["variable"] == missing
+    assert logs[1]["unit_counts"] == str({"doses": 3, "people": 2})
+
+
+def test_query_multiple_variables_logs_hint_for_missing_variable_name():
+    variable = ccd_helpers.ScraperVariable(
+        variable_name="total_vaccine_completed",
+        measurement="cumulative",
+        unit="people",
+        provider="cdc",
+        common_field=CommonFields.VACCINATIONS_COMPLETED,
+    )
+    missing = dataclasses.replace(
+        variable,
+        variable_name="total_vaccine_initiated",
+        common_field=CommonFields.VACCINATIONS_INITIATED,
+    )
+
+    input_data = _build_can_scraper_dataframe({variable: [10, 20]})
+    # Key columns are Categoricals, as in a dataset returned by `load`.
+    for column in ["provider", "variable_name", "measurement", "unit", "age", "race", "sex"]:
+        input_data[column] = input_data[column].astype("category")
+    data = ccd_helpers.CovidCountyDataset(input_data)
+    with structlog.testing.capture_logs() as logs:
+        results = data.query_multiple_variables(
+            [variable, missing], log_provider_coverage_warnings=True
+        )
+
+    assert list(results[CommonFields.VACCINATIONS_COMPLETED]) == [10, 20]
+    assert CommonFields.VACCINATIONS_INITIATED not in results.columns
+    assert [l["event"] for l in logs] == ["No data rows found for variable", "Try these parameters"]
+    assert logs[1]["unit_counts"] == str({})
+
+
+def test_fetch_data_writes_clustered_copy(tmp_path, monkeypatch):
+    cdc = ccd_helpers.ScraperVariable(variable_name="b", provider="cdc")
+    state = dataclasses.replace(cdc, provider="state")
+    cdc_a = dataclasses.replace(cdc, variable_name="a")
+    input_data = _build_can_scraper_dataframe({state: [1, 2], cdc: [3, 4], cdc_a: [5, 6]})
+    data_path = tmp_path / "data.parquet"
+    monkeypatch.setattr(ccd_helpers, "DATA_PATH", data_path)
+    monkeypatch.setattr(ccd_helpers, "_CLUSTERED_ROW_GROUP_SIZE", 2)
+
+    def fake_download(url, path):
+        input_data.to_parquet(path)
+        return True
+
+    monkeypatch.setattr(helpers, "download_if_changed", fake_download)
+
+    ccd_helpers.fetch_data()
+    clustered_path = ccd_helpers.clustered_data_path()
+
+    assert clustered_path == tmp_path / "data.clustered.parquet"
+    assert pyarrow.parquet.ParquetFile(clustered_path).num_row_groups == 3
+    results = pd.read_parquet(clustered_path)
+    assert list(results["provider"]) == ["cdc", "cdc", "cdc", "cdc", "state", "state"]
+    assert list(results["value"]) == [5, 6, 3, 4, 1, 2]
+    # The downloaded file is not modified.
+    pd.testing.assert_frame_equal(pd.read_parquet(data_path), input_data)
+
+
+def test_clustered_data_path_without_clustered_copy(tmp_path, monkeypatch):
+    variable = ccd_helpers.ScraperVariable(variable_name="b", provider="cdc")
+    data_path = tmp_path / "data.parquet"
+    _build_can_scraper_dataframe({variable: [1, 2]}).to_parquet(data_path)
+    monkeypatch.setattr(ccd_helpers, "DATA_PATH", data_path)
+
+    assert ccd_helpers.clustered_data_path() == data_path
+    assert not (tmp_path / "data.clustered.parquet").exists()
+
+
+def test_query_multiple_variables_duplicate_variable():
+    variable = ccd_helpers.ScraperVariable(
+        variable_name="total_vaccine_completed",
+        measurement="cumulative",
+        unit="people",
+        provider="cdc",
+        common_field=CommonFields.VACCINATIONS_COMPLETED,
+    )
+    input_data = _build_can_scraper_dataframe({variable: [10, 20]})
+    data = ccd_helpers.CovidCountyDataset(input_data)
+
+    with structlog.testing.capture_logs() as logs:
+        results = data.query_multiple_variables([variable, variable])
+
+    expected_buf = io.StringIO(
+        "fips,date,aggregate_level,vaccinations_completed\n"
+        f"36,2021-01-01,state,10\n"
+        f"36,2021-01-02,state,20\n"
+    )
+    expected = common_df.read_csv(expected_buf, set_index=False)
+    pd.testing.assert_frame_equal(expected, results)
+    assert logs == []
+
+
+def test_load_with_variables_checks_coverage_of_all_provider_variables(tmp_path, monkeypatch):
+    variable = ccd_helpers.ScraperVariable(
+        variable_name="total_vaccine_completed",
+        measurement="cumulative",
+        unit="people",
+        provider="state",
+        common_field=CommonFields.VACCINATIONS_COMPLETED,
+    )
+    not_in_list = dataclasses.replace(variable, variable_name="total_vaccine_initiated")
+    other_provider = dataclasses.replace(variable, provider="cdc", variable_name="other")
+    input_data = _build_can_scraper_dataframe(
+        {variable: [10, 20], not_in_list: [30, 40, 50], other_provider: [1]}
+    )
+    input_data["location"] = input_data["location"].astype(int)
+    data_path = tmp_path / "can_scrape_api_covid_us.parquet"
+    input_data.to_parquet(data_path)
+    monkeypatch.setattr(ccd_helpers, "DATA_PATH", data_path)
+
+    dataset = ccd_helpers.CovidCountyDataset.load(fetch=False, variables=[variable])
+    with structlog.testing.capture_logs() as logs:
+        results = dataset.query_multiple_variables([variable], log_provider_coverage_warnings=True)
+
+    assert list(results[CommonFields.VACCINATIONS_COMPLETED]) == [10, 20]
+    assert [(l["event"], l["variable_name"], l["count"]) for l in logs] == [
+        ("Upstream has variable not in variables list", "total_vaccine_initiated", 3)
+    ]
@@ -120,6 +120,44 @@ def test_write_csv():
     assert repr(df) == repr(df_original)
 
 
+def test_write_csv_category_columns():
+    df = pd.DataFrame(
+        {
+            CommonFields.DATE: ["2020-04-01", "2020-04-02"],
+            CommonFields.FIPS: ["06045", "45123"],
+            CommonFields.AGGREGATE_LEVEL: ["county", None],
+            CommonFields.CASES: [234, 456],
+        }
+    ).astype({CommonFields.FIPS: "category", CommonFields.AGGREGATE_LEVEL: "category"})
+    expected_csv = """fips,date,aggregate_level,cases
+06045,2020-04-01,county,234
+45123,2020-04-02,,456
+"""
+    with temppathlib.NamedTemporaryFile("w+") as tmp:
+        common_df.write_csv(df, tmp.path, structlog.get_logger())
+        assert expected_csv == tmp.file.read()
+
+
+def test_write_parquet():
+    df = pd.DataFrame(
+        {
+            CommonFields.DATE: pd.to_datetime(["2020-04-02", "2020-04-01"]),
+            CommonFields.FIPS: ["45123", "06045"],
+            CommonFields.CASES: [456, 234],
+        }
+    )
+    with temppathlib.TemporaryDirectory() as tmp_dir:
+        csv_path = tmp_dir.path / "timeseries.csv"
+        parquet_path = tmp_dir.path / "timeseries.parquet"
+        common_df.write_csv(df, csv_path, structlog.get_logger())
+        from_csv = common_df.read_csv(csv_path)
+        common_df.write_parquet(df, parquet_path, structlog.get_logger())
+        from_parquet = pd.read_parquet(parquet_path).set_index(COMMON_FIELDS_TIMESERIES_KEYS)
+
+    pd.testing.assert_frame_equal(from_csv, from_parquet)
+    assert from_parquet.index.get_level_values(CommonFields.FIPS).tolist() == ["06045", "45123"]
+
+
 def test_write_csv_without_date():
     df = pd.DataFrame(
         {
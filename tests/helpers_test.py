@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts import helpers
+
+
+def test_fips_from_int():
+    fips = helpers.fips_from_int(pd.Series([1, 36, 1001, 36061], index=[3, 4, 5, 6], name="loc"))
+
+    expected = pd.Series(["01", "36", "01001", "36061"], index=[3, 4, 5, 6], name="loc")
+    pd.testing.assert_series_equal(fips, expected)
+
+
+def test_fips_from_int_missing_values():
+    fips = helpers.fips_from_int(pd.Series([1.0, None, 1001.0]))
+
+    expected = pd.Series(["01", np.nan, "01001"])
+    pd.testing.assert_series_equal(fips, expected)
+
+
+def test_download_if_changed(tmp_path, requests_mock):
+    url = "https://example.com/data.parquet"
+    path = tmp_path / "data.parquet"
+    requests_mock.get(url, content=b"v1", headers={"ETag": '"abc"'})
+
+    assert helpers.download_if_changed(url, path)
+    assert path.read_bytes() == b"v1"
+
+    requests_mock.get(
+        url, request_headers={"If-None-Match": '"abc"'}, status_code=304,
+    )
+    assert not helpers.download_if_changed(url, path)
+    assert path.read_bytes() == b"v1"
+
+
+def test_download_if_changed_truncated(tmp_path, requests_mock):
+    url = "https://example.com/data.parquet"
+    path = tmp_path / "data.parquet"
+    requests_mock.get(url, content=b"v1", headers={"ETag": '"abc"', "Content-Length": "10"})
+
+    with pytest.raises(IOError):
+        helpers.download_if_changed(url, path)
+
+    assert not path.exists()
+    assert not (tmp_path / "data.parquet.etag").exists()
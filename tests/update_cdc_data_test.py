@@ -1,8 +1,12 @@
 import io
 
+import more_itertools
 import pandas as pd
+import structlog
 from covidactnow.datapublic import common_df
 
+from scripts import ccd_helpers
+from scripts import helpers
 from scripts import update_cdc_test_data
 
 
@@ -31,3 +35,92 @@ def test_remove_trailing_zeros():
     )
     expected = common_df.read_csv(expected_buf, set_index=False)
     pd.testing.assert_frame_equal(expected.sort_index(axis=1), results.sort_index(axis=1))
+
+
+def test_remove_trailing_zeros_keeps_zeros_before_last_value():
+    data_buf = io.StringIO(
+        "fips,date,test_positivity_7d\n"
+        f"48114,2020-08-19,0.0\n"
+        f"48114,2020-08-16,0.0\n"
+        f"48114,2020-08-17,0.5\n"
+        f"48114,2020-08-18,\n"
+    )
+    data = common_df.read_csv(data_buf, set_index=False)
+    results = update_cdc_test_data.remove_trailing_zeros(data)
+
+    expected_buf = io.StringIO(
+        "fips,date,test_positivity_7d\n"
+        f"48114,2020-08-16,0.0\n"
+        f"48114,2020-08-17,0.5\n"
+        f"48114,2020-08-18,\n"
+        f"48114,2020-08-19,\n"
+    )
+    expected = common_df.read_csv(expected_buf, set_index=False)
+    pd.testing.assert_frame_equal(expected.sort_index(axis=1), results.sort_index(axis=1))
+
+
+def test_transform():
+    variable = more_itertools.one(update_cdc_test_data.VARIABLES)
+    input_df = pd.DataFrame(
+        {
+            "provider": variable.provider,
+            "dt": pd.to_datetime(["2020-08-17", "2020-08-18", "2020-08-17"]),
+            "location_type": "county",
+            "location": ["48112", "48112", "11001"],
+            "variable_name": variable.variable_name,
+            "measurement": variable.measurement,
+            "unit": variable.unit,
+            "age": "all",
+            "race": "all",
+            "sex": "all",
+            "value": [5.0, 6.0, 12.5],
+        }
+    )
+    results = update_cdc_test_data.transform(ccd_helpers.CovidCountyDataset(input_df))
+
+    expected_buf = io.StringIO(
+        "fips,date,aggregate_level,test_positivity_7d\n"
+        "11,2020-08-17,state,0.125\n"
+        "11001,2020-08-17,county,0.125\n"
+        "48112,2020-08-17,county,0.05\n"
+        "48112,2020-08-18,county,0.06\n"
+    )
+    expected = helpers.categorize_location_columns(
+        common_df.read_csv(expected_buf, set_index=False)
+    )
+    pd.testing.assert_frame_equal(expected, results, check_like=True)
+
+
+def test_load_transform_write_csv(tmp_path, monkeypatch):
+    variable = more_itertools.one(update_cdc_test_data.VARIABLES)
+    # The last two rows, from another provider and for a single age group, are filtered out by
+    # the parquet read.
+    input_df = pd.DataFrame(
+        {
+            "provider": [variable.provider] * 3 + ["other"],
+            "dt": pd.to_datetime(["2020-08-17", "2020-08-18", "2020-08-19", "2020-08-19"]),
+            "location_type": "county",
+            "location": [48112, 48112, 48112, 48112],
+            "variable_name": variable.variable_name,
+            "measurement": variable.measurement,
+            "unit": variable.unit,
+            "age": ["all", "all", "0-17", "all"],
+            "race": "all",
+            "sex": "all",
+            "value": [7.5, 6.0, 5.0, 4.0],
+        }
+    )
+    data_path = tmp_path / "can_scrape_api_covid_us.parquet"
+    input_df.to_parquet(data_path)
+    monkeypatch.setattr(ccd_helpers, "DATA_PATH", data_path)
+    output_path = tmp_path / "timeseries-common.csv"
+
+    dataset = ccd_helpers.CovidCountyDataset.load(fetch=False, variables=[variable])
+    results = update_cdc_test_data.transform(dataset)
+    common_df.write_csv(results, output_path, structlog.get_logger())
+
+    assert output_path.read_text() == (
+        "fips,date,aggregate_level,test_positivity_7d\n"
+        "48112,2020-08-17,county,0.075\n"
+        "48112,2020-08-18,county,0.06\n"
+    )
@@ -0,0 +1,143 @@
+import datetime
+import zipfile
+from typing import List
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from covidactnow.datapublic.common_fields import CommonFields
+
+from scripts import update_cms_testing_data
+
+
+def _write_xlsx(path, rows: List[List]):
+    """Writes `rows` to the first sheet of a minimal xlsx file. None is an empty cell."""
+    shared_strings = []
+    row_xml = []
+    for row_index, row in enumerate(rows, start=1):
+        cells = []
+        for column_index, value in enumerate(row):
+            if value is None:
+                continue
+            ref = f"{chr(ord('A') + column_index)}{row_index}"
+            if isinstance(value, str):
+                cells.append(f'<c r="{ref}" t="s"><v>{len(shared_strings)}</v></c>')
+                shared_strings.append(value)
+            else:
+                cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        if cells:
+            row_xml.append(f'<row r="{row_index}">{"".join(cells)}</row>')
+
+    main_ns = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    rel_ns = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+    with zipfile.ZipFile(path, "w") as xlsx:
+        xlsx.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" '
+            'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            f'<Override PartName="/xl/workbook.xml" ContentType="{content_type}.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            f'ContentType="{content_type}.worksheet+xml"/>'
+            '<Override PartName="/xl/sharedStrings.xml" '
+            f'ContentType="{content_type}.sharedStrings+xml"/>'
+            "</Types>",
+        )
+        xlsx.writestr(
+            "_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{rel_ns}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>",
+        )
+        xlsx.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<workbook xmlns="{main_ns}" xmlns:r="{rel_ns}">'
+            '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+            "</workbook>",
+        )
+        xlsx.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{rel_ns}/worksheet" Target="worksheets/sheet1.xml"/>'
+            f'<Relationship Id="rId2" Type="{rel_ns}/sharedStrings" Target="sharedStrings.xml"/>'
+            "</Relationships>",
+        )
+        xlsx.writestr(
+            "xl/worksheets/sheet1.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<worksheet xmlns="{main_ns}"><sheetData>{"".join(row_xml)}</sheetData></worksheet>',
+        )
+        xlsx.writestr(
+            "xl/sharedStrings.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<sst xmlns="{main_ns}" count="{len(shared_strings)}" '
+            f'uniqueCount="{len(shared_strings)}">'
+            + "".join(f"<si><t>{escape(s)}</t></si>" for s in shared_strings)
+            + "</sst>",
+        )
+
+
+def _write_dataset_zip(tmp_path, rows: List[List]):
+    xlsx_path = tmp_path / "dataset.xlsx"
+    _write_xlsx(xlsx_path, rows)
+    zip_path = tmp_path / "2020-10-06.zip"
+    with zipfile.ZipFile(zip_path, "w") as dataset_zip:
+        dataset_zip.write(xlsx_path, "COVID-19 Test Positivity.xlsx")
+    return zip_path
+
+
+# Rows of a CMS dataset with title rows and a blank row above the column names and a blank row in
+# the data.
+_DATASET_ROWS = [
+    ["COVID-19 County Test Positivity Rates"],
+    ["Data through 10/06/20"],
+    [],
+    ["County", "FIPS Code", "State", "Population", "Percent Positivity in prior 14 days"],
+    ["Autauga County", 1001.0, "AL", 55869.0, 0.052],
+    [],
+    ["Baldwin County", 1003.0, "AL", 223234.0, 0.0],
+    ["Barbour County", 1005.0, "AL", 24686.0, "<10 tests"],
+    ["Total", "* Excludes counties with fewer than 10 tests", None, None, None],
+]
+
+
+def test_read_cms_dataset_from_zip(tmp_path):
+    zip_path = _write_dataset_zip(tmp_path, _DATASET_ROWS)
+
+    df = update_cms_testing_data.read_cms_dataset_from_zip(zip_path)
+
+    assert list(df.columns) == _DATASET_ROWS[3]
+    assert list(df["County"]) == ["Autauga County", "Baldwin County", "Barbour County", "Total"]
+    # Integer valued floats are read as int, as pd.read_excel did.
+    assert list(df["FIPS Code"][:3]) == [1001, 1003, 1005]
+    assert list(df["Population"][:3]) == [55869, 223234, 24686]
+    assert list(df["Percent Positivity in prior 14 days"][:3]) == [0.052, 0, "<10 tests"]
+
+
+def test_transform_cms_dataset(tmp_path):
+    zip_path = _write_dataset_zip(tmp_path, _DATASET_ROWS)
+    df = update_cms_testing_data.read_cms_dataset_from_zip(zip_path)
+    date = datetime.date(2020, 10, 6)
+
+    results = update_cms_testing_data.transform_cms_dataset(date, df)
+
+    expected = pd.DataFrame(
+        {
+            CommonFields.DATE: [date] * 4,
+            # The footnote in the FIPS column becomes a missing FIPS.
+            CommonFields.FIPS: ["01001", "01003", "01005", np.nan],
+            CommonFields.COUNTRY: "USA",
+            CommonFields.STATE: ["AL", "AL", "AL", np.nan],
+            CommonFields.COUNTY: ["Autauga County", "Baldwin County", "Barbour County", "Total"],
+            CommonFields.AGGREGATE_LEVEL: "county",
+            # 0% positivity is kept. Non-numeric values are removed.
+            CommonFields.TEST_POSITIVITY_14D: [0.052, 0.0, np.nan, np.nan],
+        }
+    )
+    pd.testing.assert_frame_equal(results.reset_index(drop=True), expected)
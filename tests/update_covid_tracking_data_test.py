@@ -1,5 +1,6 @@
 from io import StringIO
 
+import pandas as pd
 import pytest
 import structlog
 
@@ -70,3 +71,14 @@ def test_transform_icu_greater_than_hospitalized():
         ICU_HOSPITALIZED_MISMATCH_WARNING_MESSAGE,
         helpers.MISSING_COLUMNS_MESSAGE,
     ]
+
+
+def test_parse_dates():
+    dates = pd.Series([20200401, 20201231, 20210228], index=[3, 4, 5])
+    expected = pd.Series(
+        pd.to_datetime(["2020-04-01", "2020-12-31", "2021-02-28"]), index=[3, 4, 5]
+    )
+    pd.testing.assert_series_equal(update_covid_tracking_data._parse_dates(dates), expected)
+
+    with pytest.raises(ValueError):
+        update_covid_tracking_data._parse_dates(pd.Series([20200230]))
@@ -0,0 +1,52 @@
+import pandas as pd
+import structlog
+from covidactnow.datapublic import common_df
+from covidactnow.datapublic.common_fields import CommonFields
+
+from scripts import ccd_helpers
+from scripts import update_hhs_hospital_data
+
+
+def test_update_drops_dates_without_values(tmp_path, monkeypatch):
+    rows = []
+    for date, value in [("2020-11-09", float("nan")), ("2020-11-10", 10.0)]:
+        for variable_name in ["adult_icu_beds_capacity", "hospital_beds_in_use_covid"]:
+            rows.append(
+                {
+                    "provider": "hhs",
+                    "dt": pd.Timestamp(date),
+                    "location_type": "state",
+                    "location": 2,
+                    "variable_name": variable_name,
+                    "measurement": "current",
+                    "unit": "beds",
+                    "age": "all",
+                    "race": "all",
+                    "sex": "all",
+                    "value": value,
+                }
+            )
+    data_path = tmp_path / "can_scrape_api_covid_us.parquet"
+    pd.DataFrame(rows).to_parquet(data_path)
+    monkeypatch.setattr(ccd_helpers, "DATA_PATH", data_path)
+    county_metadata = pd.DataFrame(
+        {CommonFields.COUNTY: ["Aleutians East Borough"], CommonFields.STATE: ["AK"]},
+        index=pd.Index(["02013"], name=CommonFields.FIPS),
+    )
+    monkeypatch.setattr(update_hhs_hospital_data, "_load_county_metadata", lambda: county_metadata)
+
+    results = update_hhs_hospital_data.update(fetch=False)
+
+    output_path = tmp_path / "timeseries-common.csv"
+    common_df.write_csv(results, output_path, structlog.get_logger())
+
+    # The all-NaN 2020-11-09 values don't produce a row.
+    assert output_path.read_text() == (
+        "fips,date,state,country,county,aggregate_level,current_hospitalized,icu_beds\n"
+        "02,2020-11-10,AK,USA,,state,10,10\n"
+    )
+
+
+def test_fips_to_state_includes_dc():
+    assert update_hhs_hospital_data.FIPS_TO_STATE["11"] == "DC"
+    assert update_hhs_hospital_data.FIPS_TO_STATE["72"] == "PR"
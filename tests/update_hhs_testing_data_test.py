@@ -0,0 +1,50 @@
+import pandas as pd
+import structlog
+from covidactnow.datapublic import common_df
+
+from scripts import update_hhs_testing_data
+
+
+def test_transform(tmp_path):
+    input_df = pd.DataFrame(
+        {
+            "state": ["AL", "AL", "AL", "AL", "AL", "AL", "AK", "AK"],
+            "state_fips": ["01", "01", "01", "01", "01", "01", "02", "02"],
+            "date": pd.to_datetime(
+                [
+                    "2020-10-01",
+                    "2020-10-01",
+                    "2020-10-01",
+                    "2020-10-01",
+                    "2020-10-02",
+                    "2020-10-02",
+                    "2020-10-01",
+                    "2020-10-01",
+                ]
+            ),
+            "overall_outcome": [
+                "Positive",
+                "Positive",
+                "Negative",
+                "Inconclusive",
+                "Positive",
+                "Negative",
+                "Positive",
+                "Negative",
+            ],
+            "total_results_reported": [10, 20, 90, 5, float("nan"), 100, 3, 7],
+        }
+    )
+
+    results = update_hhs_testing_data.transform(input_df)
+
+    output_path = tmp_path / "timeseries-common.csv"
+    common_df.write_csv(results, output_path, structlog.get_logger())
+    # The duplicate Positive rows of 01 on 2020-10-01 are averaged. Inconclusive rows and rows
+    # without a value are dropped.
+    assert output_path.read_text() == (
+        "fips,date,state,country,aggregate_level,positive_tests,negative_tests\n"
+        "01,2020-10-01,AL,USA,state,15,90\n"
+        "01,2020-10-02,AL,USA,state,,100\n"
+        "02,2020-10-01,AK,USA,state,3,7\n"
+    )
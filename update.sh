@@ -14,9 +14,7 @@ python scripts/update_test_and_trace.py
 python scripts/update_can_scraper_state_providers.py --fetch
 python scripts/update_cdc_test_data.py --no-fetch
 python scripts/update_cdc_vaccine_data.py --no-fetch
-
-# HHS hospital data also uses the parquet file, but pulls directly from the bucket.
-python scripts/update_hhs_hospital_data.py
+python scripts/update_hhs_hospital_data.py --no-fetch
 
 # TODO(https://trello.com/c/PeQXdUCU): Fix Texas hospitalizations.
 python scripts/update_texas_tsa_hospitalizations.py || echo "Failed to update Texas Hospitals"